@@ -0,0 +1,1093 @@
+# Benchmark harness. Seeds a reproducible synthetic dataset into the database
+# named by DATABASE_URL and drives the app through its main pages, recording
+# latency percentiles, SQL statements per request and RSS per endpoint as JSON
+# so runs can be compared.
+#
+#   python benchmark.py seed --yes                  # replaces all data in the database
+#   python benchmark.py run -o results.json         # in-process, Flask test client
+#   python benchmark.py run --url http://127.0.0.1:8000 --concurrency 8 --server-pid 1234 -o http.json
+#   python benchmark.py run --scenarios pages --pages 'manage_attendees|manage_groups' --max-p95-ms 100
+#   python benchmark.py seed --yes --attendees 50000 && python benchmark.py run --scenarios search --max-p95-ms 20
+#   python benchmark.py run --scenarios import --import-rows 100000 --max-p95-ms 30000
+#   python benchmark.py seed --yes --classes 500000 --roster-size 3 && python benchmark.py run --scenarios deep_pages
+#   python benchmark.py compare baseline.json results.json
+#   python benchmark.py check-queries --yes         # statements per route must not grow with data
+#   python benchmark.py run --scenarios writes      # commits per write action
+#   python benchmark.py run --scenarios attendance  # attendance submission at roster sizes 10, 100 and 500
+#
+# Statement counts come from the Server-Timing header, so the app (or the
+# gunicorn server in --url mode) needs PERF_INSTRUMENTATION=true; the harness
+# turns it on for in-process runs unless it is set explicitly.
+import os
+import sys
+import argparse
+import io
+import json
+import logging
+import math
+import platform
+import random
+import re
+import subprocess
+import tempfile
+import threading
+import time
+from collections import Counter, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timedelta
+from http.cookiejar import CookieJar
+from urllib.error import HTTPError
+from urllib.parse import urlencode, urljoin
+from urllib.request import HTTPCookieProcessor, HTTPRedirectHandler, Request, build_opener
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+ADMIN_PASSWORD = 'admin123'
+COUNSELOR_PASSWORD = 'counselor123'
+SERVER_TIMING_RE = re.compile(r'db;dur=([\d.]+);desc="(\d+) queries", tpl;dur=([\d.]+)')
+COMMITS_RE = re.compile(r'commit;desc="(\d+) commits"')
+
+FIRST_NAMES = ['James', 'Mary', 'Robert', 'Patricia', 'John', 'Jennifer', 'Michael', 'Linda', 'David', 'Elizabeth',
+               'William', 'Barbara', 'Richard', 'Susan', 'Joseph', 'Jessica', 'Thomas', 'Sarah', 'Carlos', 'Karen',
+               'Daniel', 'Lisa', 'Matthew', 'Nancy', 'Anthony', 'Maria', 'Mark', 'Sandra', 'Wei', 'Aisha']
+LAST_NAMES = ['Smith', 'Johnson', 'Williams', 'Brown', 'Jones', 'Garcia', 'Miller', 'Davis', 'Rodriguez', 'Martinez',
+              'Hernandez', 'Lopez', 'Gonzalez', 'Wilson', 'Anderson', 'Thomas', 'Taylor', 'Moore', 'Jackson', 'Martin',
+              'Lee', 'Perez', 'Thompson', 'White', 'Harris', 'Sanchez', 'Clark', 'Ramirez', 'Lewis', 'Nguyen']
+CLASS_NAMES = ['Mindfulness', 'Stress Management', 'Coping Skills', 'Relapse Prevention', 'Anger Management',
+               'Life Skills', 'Family Dynamics', 'Yoga Session', 'Art Therapy', 'Process Group']
+CREDENTIALS = ['Clinical Trainee', 'Therapist', 'LCSW', 'LPC', 'CADC']
+GROUP_HOURS = ['09:00-10:30', '11:00-12:30', '13:00-14:30', '15:00-16:30']
+LOCATIONS = ['Office', 'Zoom', 'Room 101', 'Room 202']
+
+DATASET_DEFAULTS = {'seed': 1, 'counselors': 50, 'attendees': 5000, 'groups': 40, 'years': 3.0,
+                    'series_per_counselor': 4, 'one_off_per_counselor': 20, 'roster_size': 15,
+                    'attendance_rate': 0.95, 'lock_after_days': 30, 'classes': None}
+# check-queries seeds both in turn; every page must run the same statements on each
+QUERY_CHECK_SIZES = {
+    'small': dict(DATASET_DEFAULTS, counselors=3, attendees=60, groups=4, years=0.25, series_per_counselor=2,
+                  one_off_per_counselor=3, roster_size=5),
+    'large': dict(DATASET_DEFAULTS, counselors=20, attendees=1500, groups=20, years=1.0, one_off_per_counselor=10,
+                  roster_size=20),
+}
+
+def load_app(initialize=False):
+    # app.py reads its configuration at import time
+    os.environ.setdefault('PERF_INSTRUMENTATION', 'true')
+    os.environ.setdefault('LOG_FILE', os.path.join(tempfile.gettempdir(), 'rwc_benchmark.log'))
+    os.environ['INITIALIZE_DB'] = 'true' if initialize else 'false'
+    sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+    import app as app_module
+    return app_module
+
+def stop_scheduler(app_module):
+    # The app starts its scheduler on the first request
+    if app_module.scheduler.running:
+        app_module.scheduler.shutdown(wait=False)
+
+def git_commit():
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], cwd=os.path.dirname(os.path.abspath(__file__)),
+                              capture_output=True, text=True, check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+# Synthetic dataset
+
+def seed_dataset(app_module, args):
+    started = time.monotonic()
+    password_hash = app_module.bcrypt.generate_password_hash(COUNSELOR_PASSWORD).decode('utf-8')
+    today = datetime.today().date()
+    first_monday = app_module.week_start_of(today - timedelta(days=round(args.years * 365)))
+    one_off = args.one_off_per_counselor
+    if args.classes:
+        # Top up with one-off classes; the series add about one class a week each
+        series_classes = args.counselors * args.series_per_counselor * ((today - first_monday).days // 7)
+        one_off = max(0, math.ceil((args.classes - series_classes) / args.counselors))
+    params = {'counselors': args.counselors, 'attendees': args.attendees, 'groups': args.groups,
+              'series': args.series_per_counselor, 'roster': args.roster_size, 'one_off': one_off,
+              'first_monday': first_monday, 'days': (today - first_monday).days, 'hash': password_hash,
+              'first_names': FIRST_NAMES, 'last_names': LAST_NAMES, 'class_names': CLASS_NAMES,
+              'credentials': CREDENTIALS, 'hours': GROUP_HOURS, 'locations': LOCATIONS,
+              'attendance_rate': args.attendance_rate, 'lock_days': args.lock_after_days}
+    with app_module.pooled_connection() as conn:
+        c = conn.cursor()
+        c.execute("""TRUNCATE attendance, class_attendees, attendee_groups, classes, class_series, attendees, groups,
+                     export_jobs, users, attendance_class_rollup, attendance_counselor_day_rollup,
+                     attendance_group_day_rollup RESTART IDENTITY CASCADE""")
+        c.execute("SELECT setseed(%s)", (random.Random(args.seed).uniform(-1, 1),))
+        c.execute("INSERT INTO users (username, password, full_name, role, credentials, email) VALUES (%s, %s, %s, %s, %s, %s)",
+                  ('admin', app_module.bcrypt.generate_password_hash(ADMIN_PASSWORD).decode('utf-8'), 'Admin User', 'admin',
+                   'Treatment Director', 'admin@example.com'))
+        c.execute("""
+            INSERT INTO users (username, password, full_name, role, credentials, email)
+            SELECT 'counselor' || n, %(hash)s,
+                   (%(first_names)s::text[])[1 + floor(random() * cardinality(%(first_names)s::text[]))::int] || ' ' ||
+                   (%(last_names)s::text[])[1 + floor(random() * cardinality(%(last_names)s::text[]))::int],
+                   'counselor', (%(credentials)s::text[])[1 + n %% cardinality(%(credentials)s::text[])],
+                   'counselor' || n || '@example.com'
+            FROM generate_series(1, %(counselors)s) n
+        """, params)
+        c.execute("INSERT INTO groups (name) SELECT 'Group ' || n FROM generate_series(1, %(groups)s) n", params)
+        c.execute("""
+            INSERT INTO attendees (full_name, attendee_id, group_details, notes)
+            SELECT (%(first_names)s::text[])[1 + floor(random() * cardinality(%(first_names)s::text[]))::int] || ' ' ||
+                   (%(last_names)s::text[])[1 + floor(random() * cardinality(%(last_names)s::text[]))::int],
+                   'ATT' || lpad(n::text, 6, '0'),
+                   (ARRAY['Morning Session', 'Afternoon Session', 'Evening Session'])[1 + n %% 3],
+                   CASE WHEN random() < 0.2 THEN 'Requires extra support' END
+            FROM generate_series(1, %(attendees)s) n
+        """, params)
+        # Everyone belongs to one group and about a third to a second one
+        c.execute("INSERT INTO attendee_groups (attendee_id, group_id) SELECT id, 1 + floor(random() * %(groups)s)::int FROM attendees",
+                  params)
+        c.execute("""
+            INSERT INTO attendee_groups (attendee_id, group_id)
+            SELECT id, 1 + floor(random() * %(groups)s)::int FROM attendees WHERE random() < 0.3
+            ON CONFLICT DO NOTHING
+        """, params)
+        # Weekly series on a fixed weekday per counselor, rostered from one group
+        c.execute("""
+            INSERT INTO class_series (group_name, class_name, group_hours, counselor_id, group_type, notes, location,
+                                      frequency, start_date, materialized_through, roster)
+            SELECT g.name, (%(class_names)s::text[])[1 + (u.id + k) %% cardinality(%(class_names)s::text[])],
+                   (%(hours)s::text[])[1 + k %% cardinality(%(hours)s::text[])], u.id,
+                   (ARRAY['Therapy', 'Workshop', 'Wellness'])[1 + k %% 3], NULL,
+                   (%(locations)s::text[])[1 + (u.id + k) %% cardinality(%(locations)s::text[])], 'weekly',
+                   %(first_monday)s::date + (u.id + k) %% 5, %(first_monday)s::date + (u.id + k) %% 5 - 7,
+                   ARRAY(SELECT ag.attendee_id FROM attendee_groups ag
+                         WHERE ag.group_id = g.id
+                         ORDER BY random() LIMIT %(roster)s)
+            FROM users u
+            CROSS JOIN generate_series(1, %(series)s) k
+            JOIN groups g ON g.id = 1 + (u.id * 7 + k) %% %(groups)s
+            WHERE u.role = 'counselor'
+        """, params)
+        app_module.materialize_recurring_classes(c, app_module.recurring_horizon())
+        c.execute("""
+            WITH one_off AS (
+                INSERT INTO classes (group_name, class_name, date, group_hours, counselor_id, group_type, location, recurring)
+                SELECT g.name, (%(class_names)s::text[])[1 + floor(random() * cardinality(%(class_names)s::text[]))::int],
+                       %(first_monday)s::date + floor(random() * %(days)s)::int,
+                       (%(hours)s::text[])[1 + floor(random() * cardinality(%(hours)s::text[]))::int], u.id, 'Workshop',
+                       (%(locations)s::text[])[1 + floor(random() * cardinality(%(locations)s::text[]))::int], 0
+                FROM users u
+                CROSS JOIN generate_series(1, %(one_off)s) k
+                JOIN groups g ON g.id = 1 + (u.id * 11 + k) %% %(groups)s
+                WHERE u.role = 'counselor'
+                RETURNING id, group_name
+            )
+            INSERT INTO class_attendees (class_id, attendee_id)
+            SELECT o.id, ag.attendee_id
+            FROM one_off o
+            JOIN groups g ON g.name = o.group_name
+            CROSS JOIN LATERAL (SELECT attendee_id FROM attendee_groups
+                                WHERE group_id = g.id AND o.id > 0
+                                ORDER BY random() LIMIT %(roster)s) ag
+        """, params)
+        # Attendance for past classes: mostly present, the rest spread over the other statuses
+        c.execute("""
+            INSERT INTO attendance (class_id, attendee_id, time_in, time_out, attendance_status, location)
+            SELECT class_id, attendee_id,
+                   CASE WHEN status = 'Present' THEN start_time END, CASE WHEN status = 'Present' THEN end_time END,
+                   status, location
+            FROM (
+                SELECT ca.class_id, ca.attendee_id, cl.start_time, cl.end_time, cl.location,
+                       CASE WHEN r < 0.80 THEN 'Present' WHEN r < 0.92 THEN 'Absent' WHEN r < 0.95 THEN 'Discharged'
+                            WHEN r < 0.98 THEN 'Stepdown' ELSE 'Individual Session' END AS status
+                FROM (SELECT class_id, attendee_id, random() AS r FROM class_attendees) ca
+                JOIN classes cl ON cl.id = ca.class_id
+                WHERE cl.date < CURRENT_DATE
+                  AND cl.id %% 1000 < %(attendance_rate)s * 1000
+            ) marked
+        """, params)
+        c.execute("UPDATE classes SET locked = TRUE WHERE date < CURRENT_DATE - %(lock_days)s", params)
+        app_module.rebuild_attendance_rollups(c)
+        conn.commit()
+        conn.autocommit = True
+        try:
+            c.execute("VACUUM ANALYZE")
+        finally:
+            conn.autocommit = False
+    reset_caches(app_module)
+    with app_module.pooled_connection() as conn:
+        counts = dataset_counts(conn.cursor())
+    counts['seconds'] = round(time.monotonic() - started, 1)
+    return counts
+
+def reset_caches(app_module):
+    app_module.class_count_cache.clear()
+    app_module.invalidate_week_schedule()
+    app_module.invalidate_attendee_search()
+    app_module.user_cache.clear()
+    app_module.fragment_cache.clear()
+
+def dataset_counts(c):
+    counts = {}
+    for table in ('users', 'attendees', 'groups', 'class_series', 'classes', 'class_attendees', 'attendance'):
+        c.execute(f"SELECT COUNT(*) FROM {table}")
+        counts[table] = c.fetchone()[0]
+    c.execute("SELECT MIN(date), MAX(date) FROM classes")
+    first, last = c.fetchone()
+    counts['first_class'], counts['last_class'] = str(first), str(last)
+    return counts
+
+# Clients: the Flask test client in-process, or urllib against a running server.
+# Both return (status, headers, body) and leave redirects unfollowed.
+
+class TestClient:
+    def __init__(self, app_module):
+        self.client = app_module.app.test_client()
+
+    def request(self, method, path, data=None, headers=None):
+        response = self.client.open(path, method=method, data=data, headers=headers or {})
+        return response.status_code, response.headers, response.get_data()
+
+class NoRedirect(HTTPRedirectHandler):
+    def redirect_request(self, req, fp, code, msg, headers, newurl):
+        return None
+
+class HttpClient:
+    def __init__(self, base_url):
+        self.base_url = base_url
+        self.opener = build_opener(HTTPCookieProcessor(CookieJar()), NoRedirect())
+
+    def request(self, method, path, data=None, headers=None):
+        body = urlencode(data, doseq=True).encode() if data is not None else None
+        req = Request(urljoin(self.base_url, path), data=body, method=method, headers=headers or {})
+        try:
+            with self.opener.open(req, timeout=600) as response:
+                return response.status, response.headers, response.read()
+        except HTTPError as e:
+            return e.code, e.headers, e.read()
+
+def login(client, username, password):
+    status, headers, _ = client.request('POST', '/login', {'username': username, 'password': password})
+    if status != 302 or '/login' in headers.get('Location', ''):
+        raise SystemExit(f"Could not log in as {username}; seed the database with 'python benchmark.py seed --yes'")
+    return client
+
+def role_client(client, role):
+    if role == 'admin':
+        return login(client, 'admin', ADMIN_PASSWORD)
+    if role == 'counselor':
+        return login(client, 'counselor1', COUNSELOR_PASSWORD)
+    if role == 'other_counselor':
+        return login(client, 'counselor2', COUNSELOR_PASSWORD)
+    return client
+
+# Measurements
+
+def percentile(values, pct):
+    ordered = sorted(values)
+    return ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)]
+
+def process_memory_kb(pids):
+    # (current RSS summed over pids, highest peak RSS of any of them)
+    rss = hwm = 0
+    for pid in pids:
+        try:
+            with open(f'/proc/{pid}/status') as f:
+                for line in f:
+                    if line.startswith('VmRSS:'):
+                        rss += int(line.split()[1])
+                    elif line.startswith('VmHWM:'):
+                        hwm = max(hwm, int(line.split()[1]))
+        except OSError:
+            pass
+    return rss, hwm
+
+def server_pids(pid):
+    # A gunicorn master and, recursively, its workers
+    pids = [pid]
+    try:
+        for task in os.listdir(f'/proc/{pid}/task'):
+            with open(f'/proc/{pid}/task/{task}/children') as f:
+                for child in f.read().split():
+                    pids.extend(server_pids(int(child)))
+    except OSError:
+        pass
+    return pids
+
+class Recorder:
+    def __init__(self, server_pid=None):
+        self.server_pid = server_pid
+        self.samples = defaultdict(list)
+        self.memory = {}
+        self._lock = threading.Lock()
+
+    def memory_kb(self):
+        if self.server_pid:
+            return process_memory_kb(server_pids(self.server_pid))
+        if os.path.exists('/proc/self/status'):
+            return process_memory_kb(['self'])
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss if resource else 0
+        if sys.platform == 'darwin':
+            peak //= 1024
+        return peak, peak
+
+    def add(self, label, elapsed_ms, status=200, headers=None, size=None):
+        queries = db_ms = template_ms = commits = None
+        server_timing = (headers or {}).get('Server-Timing', '')
+        match = SERVER_TIMING_RE.search(server_timing)
+        if match:
+            db_ms, queries, template_ms = float(match.group(1)), int(match.group(2)), float(match.group(3))
+        match = COMMITS_RE.search(server_timing)
+        if match:
+            commits = int(match.group(1))
+        with self._lock:
+            self.samples[label].append((elapsed_ms, status, queries, db_ms, template_ms, size, commits))
+
+    def timed(self, label, client, method, path, data=None, headers=None):
+        started = time.perf_counter()
+        status, response_headers, body = client.request(method, path, data, headers)
+        self.add(label, (time.perf_counter() - started) * 1000, status, response_headers, len(body))
+        return status, response_headers, body
+
+    @staticmethod
+    def discard(label, client, method, path, data=None, headers=None):
+        return client.request(method, path, data, headers)
+
+    def track_memory(self, label, before):
+        rss, hwm = self.memory_kb()
+        entry = self.memory.setdefault(label, {'peak_rss_kb': 0, 'rss_growth_kb': 0})
+        entry['peak_rss_kb'] = max(entry['peak_rss_kb'], rss, hwm)
+        entry['rss_growth_kb'] += max(0, hwm - before[1])
+
+    def summary(self):
+        results = {}
+        for label, samples in self.samples.items():
+            latencies = [s[0] for s in samples]
+            queries = [s[2] for s in samples if s[2] is not None]
+            db_ms = [s[3] for s in samples if s[3] is not None]
+            template_ms = [s[4] for s in samples if s[4] is not None]
+            sizes = [s[5] for s in samples if s[5] is not None]
+            commits = [s[6] for s in samples if s[6] is not None]
+            results[label] = {
+                'requests': len(samples),
+                'errors': sum(1 for s in samples if s[1] >= 400),
+                'mean_ms': round(sum(latencies) / len(latencies), 2),
+                'p50_ms': round(percentile(latencies, 50), 2),
+                'p90_ms': round(percentile(latencies, 90), 2),
+                'p95_ms': round(percentile(latencies, 95), 2),
+                'p99_ms': round(percentile(latencies, 99), 2),
+                'max_ms': round(max(latencies), 2),
+                'queries_avg': round(sum(queries) / len(queries), 1) if queries else None,
+                'queries_max': max(queries) if queries else None,
+                'db_ms_avg': round(sum(db_ms) / len(db_ms), 2) if db_ms else None,
+                'template_ms_avg': round(sum(template_ms) / len(template_ms), 2) if template_ms else None,
+                'bytes_avg': round(sum(sizes) / len(sizes)) if sizes else None,
+                'commits_avg': round(sum(commits) / len(commits), 1) if commits else None,
+            }
+            results[label].update(self.memory.get(label, {}))
+        return results
+
+# Scenarios
+
+def discover(c):
+    c.execute("SELECT id FROM users WHERE username = 'counselor1'")
+    row = c.fetchone()
+    if not row:
+        raise SystemExit("No benchmark dataset found; run 'python benchmark.py seed --yes' first")
+    counselor_id = row[0]
+    c.execute("""
+        SELECT id FROM classes
+        WHERE counselor_id = %s AND date <= CURRENT_DATE AND NOT locked
+          AND EXISTS (SELECT 1 FROM class_attendees ca WHERE ca.class_id = classes.id)
+        ORDER BY date DESC LIMIT 1
+    """, (counselor_id,))
+    row = c.fetchone()
+    attendance_class_id = row[0] if row else None
+    c.execute("SELECT attendee_id FROM class_attendees WHERE class_id = %s ORDER BY attendee_id", (attendance_class_id,))
+    roster = [r[0] for r in c.fetchall()]
+    c.execute("SELECT MIN(id) FROM attendees")
+    attendee_id = roster[0] if roster else c.fetchone()[0]
+    c.execute("SELECT COUNT(*) FROM classes")
+    class_pages = max(1, math.ceil(c.fetchone()[0] / 10))
+    c.execute("SELECT COUNT(*) FROM attendees")
+    attendee_pages = max(1, math.ceil(c.fetchone()[0] / 25))
+    # A last name known to match, so searches run the same statements on any dataset
+    c.execute("SELECT split_part(full_name, ' ', 2), attendee_id FROM attendees WHERE id = %s", (attendee_id,))
+    search, attendee_code = c.fetchone()
+    c.execute("SELECT id, name FROM groups ORDER BY id LIMIT 1")
+    group_id, group_name = c.fetchone()
+    return {'counselor_id': counselor_id, 'attendance_class_id': attendance_class_id, 'roster': roster,
+            'attendee_id': attendee_id, 'class_pages': class_pages, 'attendee_pages': attendee_pages,
+            'search': search, 'attendee_code': attendee_code, 'group_id': group_id, 'group_name': group_name}
+
+def attendance_form(roster):
+    form = {'action': 'submit_attendance'}
+    for attendee_id in roster:
+        form[f'present_{attendee_id}'] = 'on'
+        form[f'time_in_{attendee_id}'] = '09:00'
+        form[f'time_out_{attendee_id}'] = '10:30'
+    return form
+
+def page_requests(ids):
+    # (label, role, method, path, form) for the request/response pages
+    today = datetime.today().date()
+    month_ago, year_ago = today - timedelta(days=30), today - timedelta(days=365)
+    form = attendance_form(ids['roster'])
+    class_path = f"/class_attendance/{ids['attendance_class_id']}"
+    report_form = {'action': 'generate', 'start_date': str(month_ago), 'end_date': str(today), 'class_id': 'all',
+                   'attendee_id': 'all', 'counselor_id': 'all', 'group_id': 'all', 'sort_by': 'date'}
+    requests = [
+        ('login', None, 'POST', '/login', {'username': 'counselor1', 'password': COUNSELOR_PASSWORD}),
+        ('admin_dashboard', 'admin', 'GET', '/admin_dashboard', None),
+        ('admin_dashboard[week_offset=-52]', 'admin', 'GET', '/admin_dashboard?week_offset=-52', None),
+        ('counselor_dashboard', 'counselor', 'GET', '/counselor_dashboard', None),
+        ('counselor_dashboard[past_page=20]', 'counselor', 'GET', '/counselor_dashboard?past_page=20', None),
+        ('manage_classes[page=1]', 'admin', 'GET', '/manage_classes', None),
+        ('manage_classes[page=middle]', 'admin', 'GET', f"/manage_classes?page={ids['class_pages'] // 2}", None),
+        ('manage_classes[page=last]', 'admin', 'GET', f"/manage_classes?page={ids['class_pages']}", None),
+        ('manage_classes[counselor_filter]', 'admin', 'GET', f"/manage_classes?counselor_filter={ids['counselor_id']}", None),
+        ('counselor_manage_classes[page=1]', 'counselor', 'GET', '/counselor_manage_classes', None),
+        ('manage_attendees[page=1]', 'admin', 'GET', '/manage_attendees', None),
+        ('manage_attendees[page=last]', 'admin', 'GET', f"/manage_attendees?page={ids['attendee_pages']}", None),
+        ('manage_attendees[search]', 'admin', 'GET', '/manage_attendees?' + urlencode({'q': ids['search']}), None),
+        ('manage_attendees[group_filter]', 'admin', 'GET', '/manage_attendees?' + urlencode({'group_filter': ids['group_name']}), None),
+        ('attendee_profile', 'admin', 'GET', f"/attendee_profile/{ids['attendee_id']}", None),
+        ('manage_groups', 'admin', 'GET', '/manage_groups', None),
+        ('manage_users', 'admin', 'GET', '/manage_users', None),
+        ('reports', 'admin', 'GET', '/reports', None),
+        ('reports[30 days]', 'admin', 'POST', '/reports', report_form),
+        ('reports[1 year, one counselor]', 'admin', 'POST', '/reports',
+         dict(report_form, start_date=str(year_ago), counselor_id=str(ids['counselor_id']))),
+    ]
+    if ids['attendance_class_id']:
+        requests += [
+            ('class_attendance', 'counselor', 'GET', class_path, None),
+            ('class_attendance[submit]', 'counselor', 'POST', class_path, form),
+        ]
+    return requests
+
+def run_pages(bench):
+    for label, role, method, path, form in page_requests(bench.ids):
+        if bench.pages and not re.search(bench.pages, label):
+            continue
+        # HTTP clients share one cookie jar, which is safe across threads
+        client = bench.client(role)
+        for i in range(bench.warmup):
+            bench.recorder.discard(label, client, method, path, form)
+        before = bench.recorder.memory_kb()
+        if bench.concurrency == 1:
+            for i in range(bench.iterations):
+                bench.recorder.timed(label, client, method, path, form)
+        else:
+            with ThreadPoolExecutor(bench.concurrency) as pool:
+                for future in [pool.submit(bench.recorder.timed, label, client, method, path, form)
+                               for i in range(bench.iterations)]:
+                    future.result()
+        bench.recorder.track_memory(label, before)
+
+def run_deep_pages(bench):
+    # One page deep into the unfiltered class list, reached by OFFSET (a page
+    # number, as typed into the URL) and by keyset (the cursor the previous
+    # page's Next link carries)
+    app_module = bench.app
+    client = bench.client('admin')
+    per_page = 10  # manage_classes
+    for sort_by in ('date', 'group'):
+        sort_columns, key_of = app_module.class_sort_columns(sort_by)
+        with app_module.pooled_connection() as conn:
+            c = conn.cursor()
+            c.execute("SELECT COUNT(*) FROM classes")
+            page = max(2, min(bench.deep_page, math.ceil(c.fetchone()[0] / per_page)))
+            c.execute(f"""
+                SELECT c.id, c.group_name, c.class_name, c.date FROM classes c
+                ORDER BY {', '.join(sort_columns)} OFFSET %s LIMIT 1
+            """, ((page - 1) * per_page - 1,))
+            cursor = app_module.page_cursor_serializer.dumps([page, key_of(c.fetchone()), 'next'])
+        for label, query in ((f'manage_classes[offset,page={page},sort={sort_by}]', {'page': page}),
+                             (f'manage_classes[keyset,page={page},sort={sort_by}]', {'cursor': cursor})):
+            path = '/manage_classes?' + urlencode(dict(query, sort_by=sort_by))
+            before = bench.recorder.memory_kb()
+            for i in range(bench.warmup + bench.iterations):
+                record = bench.recorder.timed if i >= bench.warmup else bench.recorder.discard
+                record(label, client, 'GET', path)
+            bench.recorder.track_memory(label, before)
+
+def run_export(bench):
+    # Background CSV export: enqueue, poll until the job is done, download
+    client = bench.client('admin')
+    today = datetime.today().date()
+    # Jobs from an earlier run would be handed back by the dedupe window
+    with bench.app.pooled_connection() as conn:
+        c = conn.cursor()
+        c.execute("DELETE FROM export_jobs RETURNING file_path")
+        for (path,) in c.fetchall():
+            if path and os.path.exists(path):
+                os.remove(path)
+        conn.commit()
+    before = bench.recorder.memory_kb()
+    for i in range(bench.iterations):
+        # Distinct date ranges within this run for the same reason
+        end = today - timedelta(days=i)
+        form = {'action': 'download_csv', 'start_date': str(end - timedelta(days=bench.export_days)), 'end_date': str(end),
+                'class_id': 'all', 'attendee_id': 'all', 'counselor_id': 'all', 'group_id': 'all', 'sort_by': 'date'}
+        started = time.perf_counter()
+        status, _, body = bench.recorder.timed('export[enqueue]', client, 'POST', '/reports', form,
+                                               {'Accept': 'application/json'})
+        if status != 202:
+            bench.recorder.add('export[job]', (time.perf_counter() - started) * 1000, status)
+            continue
+        status_url = json.loads(body)['status_url']
+        deadline = time.monotonic() + 600
+        while True:
+            status, _, body = bench.recorder.discard('export[status]', client, 'GET', status_url)
+            job = json.loads(body)
+            if job['status'] in ('done', 'failed') or time.monotonic() > deadline:
+                break
+            time.sleep(0.05)
+        bench.recorder.add('export[job]', (time.perf_counter() - started) * 1000, 200 if job['status'] == 'done' else 500)
+        if job['status'] == 'done':
+            bench.recorder.timed('export[download]', client, 'GET', job['download_url'])
+    for label in ('export[enqueue]', 'export[job]', 'export[download]'):
+        bench.recorder.track_memory(label, before)
+
+def run_attendance(bench):
+    # Submitting attendance (save_attendance plus the rollup refresh) as the
+    # class roster grows; each size gets its own class, saved over and over
+    app_module = bench.app
+    client = bench.client('counselor')
+    day = datetime.today().date()
+    for roster_size in bench.attendance_rosters:
+        label = f'class_attendance[submit,roster={roster_size}]'
+        with app_module.pooled_connection() as conn:
+            c = conn.cursor()
+            c.execute("""
+                INSERT INTO classes (group_name, class_name, date, group_hours, counselor_id, group_type, location)
+                VALUES ('Group 1', 'Benchmark Attendance', %s, '09:00-10:30', %s, 'Therapy', 'Office')
+                RETURNING id
+            """, (day, bench.ids['counselor_id']))
+            class_id = c.fetchone()[0]
+            c.execute("""
+                INSERT INTO class_attendees (class_id, attendee_id)
+                SELECT %s, id FROM attendees ORDER BY id LIMIT %s
+                RETURNING attendee_id
+            """, (class_id, roster_size))
+            roster = [row[0] for row in c.fetchall()]
+            conn.commit()
+        try:
+            form = attendance_form(roster)
+            before = bench.recorder.memory_kb()
+            for i in range(bench.warmup + bench.iterations):
+                record = bench.recorder.timed if i >= bench.warmup else bench.recorder.discard
+                record(label, client, 'POST', f'/class_attendance/{class_id}', form)
+            bench.recorder.track_memory(label, before)
+        finally:
+            with app_module.pooled_connection() as conn:
+                c = conn.cursor()
+                c.execute("DELETE FROM attendance WHERE class_id = %s", (class_id,))
+                c.execute("DELETE FROM class_attendees WHERE class_id = %s", (class_id,))
+                c.execute("DELETE FROM classes WHERE id = %s", (class_id,))
+                app_module.refresh_attendance_rollups(c, [class_id])
+                conn.commit()
+            reset_caches(app_module)
+
+def create_bench_series(c, counselor_id, weeks, roster_size):
+    start = datetime.today().date() + timedelta(days=7)
+    c.execute("""
+        INSERT INTO class_series (group_name, class_name, group_hours, counselor_id, group_type, location, frequency,
+                                  start_date, end_date, materialized_through, roster)
+        VALUES ('Group 1', 'Benchmark Series', '09:00-10:30', %s, 'Therapy', 'Office', 'weekly', %s, %s, %s,
+                ARRAY(SELECT id FROM attendees ORDER BY id LIMIT %s))
+        RETURNING id, roster
+    """, (counselor_id, start, start + timedelta(weeks=weeks - 1), start - timedelta(days=7), roster_size))
+    series_id, roster = c.fetchone()
+    return series_id, roster, start
+
+def run_series(bench):
+    # Series-wide edit (propagate) and delete-all-future cost as series length
+    # and roster size grow
+    app_module = bench.app
+    client = bench.client('admin')
+    for weeks in bench.series_weeks:
+        for roster_size in bench.roster_sizes:
+            suffix = f'[weeks={weeks},roster={roster_size}]'
+            before = bench.recorder.memory_kb()
+            for i in range(bench.warmup + bench.iterations):
+                record = bench.recorder.timed if i >= bench.warmup else bench.recorder.discard
+                with app_module.pooled_connection() as conn:
+                    c = conn.cursor()
+                    series_id, roster, start = create_bench_series(c, bench.ids['counselor_id'], weeks, roster_size)
+                    app_module.materialize_recurring_classes(c, start + timedelta(weeks=weeks), series_id=series_id)
+                    c.execute("SELECT id FROM classes WHERE series_id = %s ORDER BY date LIMIT 1", (series_id,))
+                    first_class_id = c.fetchone()[0]
+                    conn.commit()
+                form = {'action': 'edit', 'class_id': first_class_id, 'group_name': 'Group 1', 'class_name': 'Benchmark Series',
+                        'date': str(start), 'group_hours': '09:30-11:00', 'counselor_id': bench.ids['counselor_id'],
+                        'group_type': 'Therapy', 'notes': f'edit {i}', 'location': 'Zoom', 'recurring': 'on',
+                        'frequency': 'weekly', 'propagate': 'on', 'attendee_ids': list(reversed(roster))}
+                record('series_edit' + suffix, client, 'POST', '/manage_classes', form)
+                record('series_delete_all_future' + suffix, client, 'POST', '/manage_classes',
+                       {'action': 'delete_all_future', 'class_id': first_class_id})
+                with app_module.pooled_connection() as conn:
+                    c = conn.cursor()
+                    c.execute("DELETE FROM class_series WHERE id = %s", (series_id,))
+                    conn.commit()
+            bench.recorder.track_memory('series_edit' + suffix, before)
+            bench.recorder.track_memory('series_delete_all_future' + suffix, before)
+
+def run_writes(bench):
+    # One create/edit/delete cycle per iteration through the POST actions of
+    # the management pages, recording the transactions each action commits
+    admin, counselor = bench.client('admin'), bench.client('counselor')
+    ids = bench.ids
+    roster = ids['roster'][:10] or [ids['attendee_id']]
+    day = str(datetime.today().date() + timedelta(days=14))
+    run = int(time.time())
+
+    def lookup(query, params):
+        with bench.app.pooled_connection() as conn:
+            c = conn.cursor()
+            c.execute(query, params)
+            return c.fetchone()[0]
+
+    for i in range(bench.warmup + bench.iterations):
+        record = bench.recorder.timed if i >= bench.warmup else bench.recorder.discard
+        tag = f'{run}-{i}'
+
+        def post(label, client, path, form):
+            record(f'write[{label}]', client, 'POST', path, form)
+
+        post('manage_groups:add', admin, '/manage_groups', {'action': 'add', 'name': f'Bench Group {tag}'})
+        group_id = lookup("SELECT id FROM groups WHERE name = %s", (f'Bench Group {tag}',))
+        post('manage_groups:edit', admin, '/manage_groups', {'action': 'edit', 'group_id': group_id, 'name': f'Bench Group {tag}*'})
+        attendee_form = {'full_name': 'Bench Writer', 'group_details': '', 'notes': '', 'group_ids': [group_id, ids['group_id']]}
+        post('manage_attendees:add', admin, '/manage_attendees', dict(attendee_form, action='add', attendee_id=f'BENCH-WRITE-{tag}'))
+        attendee_id = lookup("SELECT id FROM attendees WHERE attendee_id = %s", (f'BENCH-WRITE-{tag}',))
+        post('manage_attendees:edit', admin, '/manage_attendees',
+             dict(attendee_form, action='edit', attendee_id=attendee_id, new_attendee_id=f'BENCH-WRITE-{tag}', notes='edited', group_ids=[group_id]))
+        class_form = {'group_name': 'Group 1', 'class_name': f'Bench Write {tag}', 'date': day, 'group_hours': '09:00-10:30',
+                      'counselor_id': ids['counselor_id'], 'group_type': 'Therapy', 'notes': '', 'location': 'Office'}
+        post('manage_classes:add', admin, '/manage_classes', dict(class_form, action='add'))
+        class_id = lookup("SELECT id FROM classes WHERE class_name = %s", (f'Bench Write {tag}',))
+        post('manage_classes:edit', admin, '/manage_classes', dict(class_form, action='edit', class_id=class_id, notes='edited',
+                                                                   attendee_ids=roster + [attendee_id]))
+        post('manage_classes:unassign_attendee', admin, '/manage_classes', {'action': 'unassign_attendee', 'class_id': class_id, 'attendee_id': attendee_id})
+        post('manage_classes:assign_attendee', admin, '/manage_classes', {'action': 'assign_attendee', 'class_id': class_id, 'attendee_id': attendee_id})
+        post('manage_classes:assign_group', admin, '/manage_classes', {'action': 'assign_group', 'class_id': class_id, 'group_id': group_id})
+        for locked in ('true', 'false'):
+            post('manage_classes:toggle_lock', admin, '/manage_classes', {'action': 'toggle_lock', 'class_id': class_id, 'locked': locked})
+        post('counselor_manage_classes:edit', counselor, '/counselor_manage_classes',
+             dict(class_form, action='edit', class_id=class_id, notes='edited by counselor', attendee_ids=roster))
+        post('counselor_manage_classes:assign_attendee', counselor, '/counselor_manage_classes',
+             {'action': 'assign_attendee', 'class_id': class_id, 'attendee_id': attendee_id})
+        post('manage_classes:delete', admin, '/manage_classes', {'action': 'delete', 'class_id': class_id})
+        post('manage_attendees:delete', admin, '/manage_attendees', {'action': 'delete', 'attendee_id': attendee_id})
+        post('manage_groups:delete', admin, '/manage_groups', {'action': 'delete', 'group_id': group_id})
+        user_form = {'username': f'bench-writer-{tag}', 'full_name': 'Bench Writer', 'credentials': 'LPC', 'email': ''}
+        post('manage_users:add_counselor', admin, '/manage_users', dict(user_form, action='add_counselor', password=COUNSELOR_PASSWORD))
+        user_id = lookup("SELECT id FROM users WHERE username = %s", (f'bench-writer-{tag}',))
+        post('manage_users:edit_counselor', admin, '/manage_users', dict(user_form, action='edit_counselor', counselor_id=user_id, full_name='Bench Writer*'))
+        post('manage_users:delete_counselor', admin, '/manage_users', {'action': 'delete_counselor', 'counselor_id': user_id})
+
+def create_bench_assignment(c, counselor_id, classes, attendees):
+    # A group of `attendees` members and `classes` one-off classes on
+    # consecutive days for the assign scenario
+    start = datetime.today().date() + timedelta(days=1)
+    c.execute("INSERT INTO groups (name) VALUES ('Benchmark Assign') RETURNING id")
+    group_id = c.fetchone()[0]
+    c.execute("""
+        INSERT INTO attendee_groups (attendee_id, group_id)
+        SELECT id, %s FROM attendees ORDER BY id LIMIT %s
+    """, (group_id, attendees))
+    c.execute("""
+        INSERT INTO classes (group_name, class_name, date, group_hours, counselor_id, group_type, location)
+        SELECT 'Benchmark Assign', 'Benchmark Assign', %s::date + n, '09:00-10:30', %s, 'Therapy', 'Office'
+        FROM generate_series(0, %s - 1) AS n
+        RETURNING id
+    """, (start, counselor_id, classes))
+    class_ids = [row[0] for row in c.fetchall()]
+    return group_id, class_ids, start
+
+def run_assign(bench):
+    # Assigning a group to one class, and to every class in a date range with
+    # the bulk action; rosters are emptied between requests
+    app_module = bench.app
+    client = bench.client('admin')
+    with app_module.pooled_connection() as conn:
+        c = conn.cursor()
+        group_id, class_ids, start = create_bench_assignment(c, bench.ids['counselor_id'], bench.assign_classes,
+                                                             bench.assign_attendees)
+        conn.commit()
+    suffix = f'[classes={len(class_ids)},attendees={bench.assign_attendees}]'
+    bulk_form = {'action': 'bulk_assign_groups', 'group_ids': [group_id], 'class_name': 'Benchmark Assign',
+                 'start_date': str(start), 'end_date': str(start + timedelta(days=len(class_ids) - 1))}
+    requests = [('assign_group' + suffix, {'action': 'assign_group', 'class_id': class_ids[0], 'group_id': group_id}),
+                ('bulk_assign_groups' + suffix, bulk_form)]
+    try:
+        for label, form in requests:
+            before = bench.recorder.memory_kb()
+            for i in range(bench.warmup + bench.iterations):
+                record = bench.recorder.timed if i >= bench.warmup else bench.recorder.discard
+                record(label, client, 'POST', '/manage_classes', form)
+                with app_module.pooled_connection() as conn:
+                    c = conn.cursor()
+                    c.execute("DELETE FROM class_attendees WHERE class_id = ANY(%s)", (class_ids,))
+                    conn.commit()
+            bench.recorder.track_memory(label, before)
+    finally:
+        with app_module.pooled_connection() as conn:
+            c = conn.cursor()
+            c.execute("DELETE FROM class_attendees WHERE class_id = ANY(%s)", (class_ids,))
+            c.execute("DELETE FROM classes WHERE id = ANY(%s)", (class_ids,))
+            c.execute("DELETE FROM groups WHERE id = %s", (group_id,))
+            conn.commit()
+        reset_caches(app_module)
+
+def search_requests(ids):
+    # (label, query string) for /attendees/search as the assignment widgets use it
+    name, code = ids['search'], ids['attendee_code']
+    typo = name[:2] + name[2:3] * 2 + name[3:]
+    requests = [(f'attendee_search[typing {n}]', {'q': name[:n]}) for n in range(2, len(name) + 1)]
+    requests += [
+        ('attendee_search[exact id]', {'q': code}),
+        ('attendee_search[id substring]', {'q': code[-4:]}),
+        ('attendee_search[fuzzy]', {'q': typo}),
+        ('attendee_search[page=3]', {'q': name, 'page': 3}),
+    ]
+    return requests
+
+def run_search(bench):
+    client = bench.client('counselor')
+    if not bench.url:
+        # The first search in a worker builds its index when pg_trgm is missing
+        for i in range(bench.iterations):
+            bench.app.invalidate_attendee_search()
+            bench.recorder.timed('attendee_search[cold]', client, 'GET', '/attendees/search?q=' + bench.ids['search'])
+    for label, query in search_requests(bench.ids):
+        path = '/attendees/search?' + urlencode(query)
+        for i in range(bench.warmup):
+            bench.recorder.discard(label, client, 'GET', path)
+        before = bench.recorder.memory_kb()
+        for i in range(bench.iterations):
+            bench.recorder.timed(label, client, 'GET', path)
+        bench.recorder.track_memory(label, before)
+
+def import_csv(rows, prefix, group_names, class_ids, seed):
+    # A cohort file in the format /manage_attendees/import takes; about 1% of
+    # the rows are invalid and a third carry class assignments
+    rng = random.Random(seed)
+    lines = ['full_name,attendee_id,groups,notes,classes']
+    for n in range(rows):
+        name = f'{rng.choice(FIRST_NAMES)} {rng.choice(LAST_NAMES)}'
+        groups = ';'.join(rng.sample(group_names, min(2, len(group_names))))
+        classes = ';'.join(str(class_id) for class_id in rng.sample(class_ids, min(2, len(class_ids)))) if n % 3 == 0 else ''
+        if n % 100 == 99:
+            groups = 'No Such Group'
+        lines.append(f'"{name}",{prefix}{n:06d},"{groups}","Imported, row {n}",{classes}')
+    return ('\n'.join(lines) + '\n').encode()
+
+def delete_imported(app_module, prefix):
+    with app_module.pooled_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT id FROM attendees WHERE attendee_id LIKE %s", (prefix + '%',))
+        ids = [row[0] for row in c.fetchall()]
+        c.execute("DELETE FROM class_attendees WHERE attendee_id = ANY(%s)", (ids,))
+        c.execute("DELETE FROM attendee_groups WHERE attendee_id = ANY(%s)", (ids,))
+        c.execute("DELETE FROM attendees WHERE id = ANY(%s)", (ids,))
+        app_module.bump_data_versions(c, 'attendees')
+        conn.commit()
+    reset_caches(app_module)
+
+def run_import(bench):
+    # CSV import of a new cohort (every row created) and of the same file again
+    # (every row updated), then the imported attendees are deleted
+    client = bench.client('admin')
+    with bench.app.pooled_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT name FROM groups WHERE name <> 'Discharged' ORDER BY id")
+        group_names = [row[0] for row in c.fetchall()]
+        c.execute("SELECT id FROM classes ORDER BY date DESC, id LIMIT 200")
+        class_ids = [row[0] for row in c.fetchall()]
+    suffix = f'[rows={bench.import_rows}]'
+    before = bench.recorder.memory_kb()
+    for i in range(bench.import_runs):
+        prefix = f'BENCH-IMPORT-{i}-'
+        data = import_csv(bench.import_rows, prefix, group_names, class_ids, i)
+        try:
+            for label in ('import[create]' + suffix, 'import[update]' + suffix):
+                bench.recorder.timed(label, client, 'POST', '/manage_attendees/import',
+                                     {'file': (io.BytesIO(data), 'cohort.csv')})
+        finally:
+            delete_imported(bench.app, prefix)
+    bench.recorder.track_memory('import[create]' + suffix, before)
+    bench.recorder.track_memory('import[update]' + suffix, before)
+
+def run_logging(bench):
+    # The reports path under three logging setups: records below the level
+    # (off), the queue listener pipeline (queue) and a plain file handler
+    # written on the request thread, as before the pipeline existed (sync).
+    client = bench.client('admin')
+    today = datetime.today().date()
+    form = {'action': 'generate', 'start_date': str(today - timedelta(days=bench.export_days)), 'end_date': str(today),
+            'class_id': 'all', 'attendee_id': 'all', 'counselor_id': 'all', 'group_id': 'all', 'sort_by': 'date'}
+    root = logging.getLogger()
+    saved_handlers, saved_level = root.handlers[:], root.level
+    sync_path = os.path.join(tempfile.gettempdir(), 'rwc_benchmark_sync.log')
+    modes = {'off': (saved_handlers, logging.WARNING), 'queue': (saved_handlers, logging.INFO),
+             'sync': ([logging.FileHandler(sync_path)], logging.INFO)}
+    try:
+        for mode, (handlers, level) in modes.items():
+            root.handlers[:] = handlers
+            root.setLevel(level)
+            label = f'logging[{mode}] reports'
+            for i in range(bench.warmup):
+                bench.recorder.discard(label, client, 'POST', '/reports', form)
+            before = bench.recorder.memory_kb()
+            for i in range(bench.iterations):
+                bench.recorder.timed(label, client, 'POST', '/reports', form)
+            bench.recorder.track_memory(label, before)
+    finally:
+        modes['sync'][0][0].close()
+        root.handlers[:] = saved_handlers
+        root.setLevel(saved_level)
+
+SCENARIOS = {'pages': run_pages, 'deep_pages': run_deep_pages, 'search': run_search, 'export': run_export, 'series': run_series, 'assign': run_assign,
+             'writes': run_writes, 'attendance': run_attendance, 'import': run_import, 'logging': run_logging}
+# The HTTP client only sends urlencoded forms, not file uploads
+IN_PROCESS_ONLY = {'import', 'logging'}
+
+class Bench:
+    def __init__(self, app_module, args):
+        self.app = app_module
+        self.url = args.url
+        self.iterations = args.iterations
+        self.warmup = args.warmup
+        self.concurrency = args.concurrency if args.url else 1
+        self.export_days = args.export_days
+        self.series_weeks = args.series_weeks
+        self.roster_sizes = args.roster_sizes
+        self.attendance_rosters = args.attendance_rosters
+        self.assign_classes = args.assign_classes
+        self.assign_attendees = args.assign_attendees
+        self.import_rows = args.import_rows
+        self.import_runs = args.import_runs
+        self.pages = args.pages
+        self.deep_page = args.deep_page
+        self.recorder = Recorder(args.server_pid)
+        self._clients = {}
+        with app_module.pooled_connection() as conn:
+            self.ids = discover(conn.cursor())
+            self.dataset = dataset_counts(conn.cursor())
+
+    def new_client(self):
+        return HttpClient(self.url) if self.url else TestClient(self.app)
+
+    def client(self, role):
+        if role is None:
+            return self.new_client()
+        if role not in self._clients:
+            self._clients[role] = role_client(self.new_client(), role)
+        return self._clients[role]
+
+# Commands
+
+def int_list(value):
+    return [int(part) for part in value.split(',') if part]
+
+def seed_command(args):
+    if not args.yes:
+        raise SystemExit('Seeding truncates every table in DATABASE_URL; pass --yes to continue')
+    # init_db recreates the schema; its sample rows are truncated below
+    app_module = load_app(initialize=True)
+    counts = seed_dataset(app_module, args)
+    stop_scheduler(app_module)
+    print(json.dumps(counts, indent=2))
+
+def run_command(args):
+    app_module = load_app()
+    bench = Bench(app_module, args)
+    meta = {'started_at': datetime.now().isoformat(timespec='seconds'), 'git_commit': git_commit(),
+            'python': platform.python_version(), 'mode': 'http' if args.url else 'in-process', 'url': args.url,
+            'concurrency': bench.concurrency, 'iterations': args.iterations, 'warmup': args.warmup,
+            'perf_instrumentation': app_module.app.config['PERF_INSTRUMENTATION'] if not args.url else None,
+            'scenarios': []}
+    for name in args.scenarios:
+        if args.url and name in IN_PROCESS_ONLY:
+            print(f"Skipping {name}: only available in-process", file=sys.stderr)
+            continue
+        print(f"Running {name}", file=sys.stderr)
+        SCENARIOS[name](bench)
+        meta['scenarios'].append(name)
+    stop_scheduler(app_module)
+    output = {'meta': meta, 'dataset': bench.dataset, 'results': bench.recorder.summary()}
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump(output, f, indent=2)
+    print_results(output['results'])
+    if args.max_p95_ms is not None:
+        over = [label for label, r in output['results'].items() if r['p95_ms'] > args.max_p95_ms]
+        if over:
+            raise SystemExit(f"p95 over {args.max_p95_ms:g} ms: {', '.join(over)}")
+
+def print_results(results):
+    print(f"{'endpoint':<48} {'n':>5} {'p50':>9} {'p95':>9} {'p99':>9} {'queries':>8} {'commits':>8} {'tpl ms':>8} {'size':>10} {'peak rss':>10}")
+    for label, r in results.items():
+        queries = '-' if r['queries_avg'] is None else f"{r['queries_avg']:g}"
+        commits = '-' if r.get('commits_avg') is None else f"{r['commits_avg']:g}"
+        template_ms = '-' if r.get('template_ms_avg') is None else f"{r['template_ms_avg']:.1f}"
+        size = '-' if r.get('bytes_avg') is None else f"{r['bytes_avg'] / 1024:.1f} KB"
+        print(f"{label:<48} {r['requests']:>5} {r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} {queries:>8} "
+              f"{commits:>8} {template_ms:>8} {size:>10} {r.get('peak_rss_kb', 0) // 1024:>7} MB" + (f"  {r['errors']} errors" if r['errors'] else ''))
+
+def capture_statements(app_module):
+    # Registered after the app's own hooks, so it runs before
+    # finish_request_profile pops the request's profile
+    captured = []
+
+    @app_module.app.after_request
+    def keep_statements(response):
+        profile = app_module.current_profile()
+        if profile is not None:
+            captured.append(Counter(sql for sql, _, _ in profile.queries))
+        return response
+    return captured
+
+def statement_counts(app_module, captured):
+    # Normalized statements run by each page, every cache cold
+    with app_module.pooled_connection() as conn:
+        ids = discover(conn.cursor())
+    clients, counts = {}, {}
+    for label, role, method, path, form in page_requests(ids):
+        if role is None:
+            client = TestClient(app_module)
+        elif role not in clients:
+            client = clients[role] = role_client(TestClient(app_module), role)
+        else:
+            client = clients[role]
+        reset_caches(app_module)
+        captured.clear()
+        status, _, _ = client.request(method, path, form)
+        counts[label] = (status, captured[-1] if captured else Counter())
+    return counts
+
+def check_queries_command(args):
+    if not args.yes:
+        raise SystemExit('check-queries seeds two datasets into DATABASE_URL, truncating every table; pass --yes to continue')
+    os.environ['PERF_INSTRUMENTATION'] = 'true'
+    app_module = load_app(initialize=True)
+    captured = capture_statements(app_module)
+    runs = {}
+    for size, dataset in QUERY_CHECK_SIZES.items():
+        print(f"Seeding {size} dataset", file=sys.stderr)
+        seed_dataset(app_module, argparse.Namespace(**dataset))
+        runs[size] = statement_counts(app_module, captured)
+    stop_scheduler(app_module)
+    if args.output:
+        with open(args.output, 'w') as f:
+            json.dump({size: {label: {'status': status, 'statements': dict(statements)}
+                              for label, (status, statements) in counts.items()}
+                       for size, counts in runs.items()}, f, indent=2)
+
+    small, large = runs['small'], runs['large']
+    failures = 0
+    for label in small:
+        (small_status, small_counts), (large_status, large_counts) = small[label], large[label]
+        problems = []
+        if small_status >= 400 or large_status >= 400:
+            problems.append(f"status {small_status} / {large_status}")
+        if small_counts != large_counts:
+            problems.append(f"{sum(small_counts.values())} statements on small data, {sum(large_counts.values())} on large")
+        if not problems:
+            print(f"ok    {label:<40} {sum(small_counts.values())} statements")
+            continue
+        failures += 1
+        print(f"FAIL  {label:<40} {'; '.join(problems)}")
+        for sql in sorted(set(small_counts) | set(large_counts), key=lambda sql: large_counts[sql] - small_counts[sql], reverse=True):
+            if small_counts[sql] != large_counts[sql]:
+                print(f"      {small_counts[sql]:>6} -> {large_counts[sql]:<6} {sql[:300]}")
+    if failures:
+        raise SystemExit(f"{failures} page(s) run a data-dependent number of statements")
+
+def compare_command(args):
+    with open(args.baseline) as f:
+        baseline = json.load(f)['results']
+    with open(args.current) as f:
+        current = json.load(f)['results']
+    regressions = 0
+    print(f"{'endpoint':<48} {'p95 before':>11} {'p95 after':>10} {'change':>8} {'queries':>14}")
+    for label in sorted(set(baseline) & set(current)):
+        old, new = baseline[label], current[label]
+        change = (new['p95_ms'] - old['p95_ms']) / old['p95_ms'] if old['p95_ms'] else 0.0
+        flags = []
+        if change > args.threshold:
+            flags.append('slower')
+        if old['queries_avg'] is not None and new['queries_avg'] is not None and new['queries_avg'] > old['queries_avg']:
+            flags.append('more queries')
+        if new['errors'] > old['errors']:
+            flags.append('errors')
+        regressions += bool(flags)
+        queries = f"{old['queries_avg']} -> {new['queries_avg']}"
+        print(f"{label:<48} {old['p95_ms']:>11.1f} {new['p95_ms']:>10.1f} {change:>+8.0%} {queries:>14}  {', '.join(flags)}")
+    for label in sorted(set(baseline) ^ set(current)):
+        print(f"{label:<48} only in {'baseline' if label in baseline else 'current'}")
+    if regressions:
+        raise SystemExit(f"{regressions} endpoint(s) regressed")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description='Seed a synthetic dataset and benchmark the app against it.')
+    commands = parser.add_subparsers(dest='command', required=True)
+
+    seed = commands.add_parser('seed', help='replace the data in DATABASE_URL with a synthetic dataset')
+    seed.add_argument('--yes', action='store_true', help='confirm that existing data may be destroyed')
+    seed.add_argument('--seed', type=int, default=DATASET_DEFAULTS['seed'])
+    seed.add_argument('--counselors', type=int, default=DATASET_DEFAULTS['counselors'])
+    seed.add_argument('--attendees', type=int, default=DATASET_DEFAULTS['attendees'])
+    seed.add_argument('--groups', type=int, default=DATASET_DEFAULTS['groups'])
+    seed.add_argument('--years', type=float, default=DATASET_DEFAULTS['years'])
+    seed.add_argument('--series-per-counselor', type=int, default=DATASET_DEFAULTS['series_per_counselor'])
+    seed.add_argument('--one-off-per-counselor', type=int, default=DATASET_DEFAULTS['one_off_per_counselor'])
+    seed.add_argument('--classes', type=int, help='about this many classes in total, made up with one-off classes')
+    seed.add_argument('--roster-size', type=int, default=DATASET_DEFAULTS['roster_size'])
+    seed.add_argument('--attendance-rate', type=float, default=DATASET_DEFAULTS['attendance_rate'], help='share of past classes with attendance taken')
+    seed.add_argument('--lock-after-days', type=int, default=DATASET_DEFAULTS['lock_after_days'])
+    seed.set_defaults(func=seed_command)
+
+    run = commands.add_parser('run', help='benchmark the app against the seeded dataset')
+    run.add_argument('-o', '--output', help='write results as JSON to this file')
+    run.add_argument('--scenarios', type=lambda v: v.split(','), default=list(SCENARIOS),
+                     help=f"comma-separated subset of {','.join(SCENARIOS)}")
+    run.add_argument('--pages', help='regular expression selecting which page labels the pages scenario requests')
+    run.add_argument('--deep-page', type=int, default=1000, help='page of the class list the deep_pages scenario requests')
+    run.add_argument('--max-p95-ms', type=float, help='exit 1 if any endpoint is slower than this at p95')
+    run.add_argument('--iterations', type=int, default=20)
+    run.add_argument('--warmup', type=int, default=2)
+    run.add_argument('--url', help='drive a running server (e.g. gunicorn) over HTTP instead of the test client')
+    run.add_argument('--concurrency', type=int, default=4, help='parallel clients per page in --url mode')
+    run.add_argument('--server-pid', type=int, help='PID of the server (and its workers) to sample RSS from in --url mode')
+    run.add_argument('--export-days', type=int, default=90, help='date range of the export and logging report')
+    run.add_argument('--series-weeks', type=int_list, default=[13, 52, 156])
+    run.add_argument('--roster-sizes', type=int_list, default=[10, 30])
+    run.add_argument('--attendance-rosters', type=int_list, default=[10, 100, 500],
+                     help='roster sizes the attendance scenario submits attendance for')
+    run.add_argument('--assign-classes', type=int, default=100, help='classes the assign scenario assigns a group to')
+    run.add_argument('--assign-attendees', type=int, default=200, help='members of the group the assign scenario assigns')
+    run.add_argument('--import-rows', type=int, default=100000, help='rows in each CSV the import scenario uploads')
+    run.add_argument('--import-runs', type=int, default=3, help='CSV files the import scenario uploads (each twice)')
+    run.set_defaults(func=run_command)
+
+    compare = commands.add_parser('compare', help='compare two result files; exits 1 on regressions')
+    compare.add_argument('baseline')
+    compare.add_argument('current')
+    compare.add_argument('--threshold', type=float, default=0.2, help='allowed p95 slowdown before flagging (0.2 = 20%%)')
+    compare.set_defaults(func=compare_command)
+
+    check = commands.add_parser('check-queries',
+                                help='seed a small and a large dataset and fail if any page runs a different set of statements on them')
+    check.add_argument('--yes', action='store_true', help='confirm that existing data may be destroyed')
+    check.add_argument('-o', '--output', help='write the statements each page ran, per dataset, as JSON')
+    check.set_defaults(func=check_queries_command)
+
+    args = parser.parse_args(argv)
+    unknown = set(getattr(args, 'scenarios', [])) - set(SCENARIOS)
+    if unknown:
+        parser.error(f"unknown scenarios: {', '.join(sorted(unknown))}")
+    args.func(args)
+
+if __name__ == '__main__':
+    main()
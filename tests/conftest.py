@@ -0,0 +1,55 @@
+# The tests drive the app against the database named by DATABASE_URL and are
+# skipped without one. They expect the synthetic dataset from benchmark.py; an
+# empty database is initialised and seeded with a small one, a database that
+# already holds data is used as it is.
+import argparse
+import os
+import sys
+
+import pytest
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import benchmark
+
+TEST_DATASET = dict(benchmark.DATASET_DEFAULTS, counselors=5, attendees=300, groups=6, years=0.5,
+                    one_off_per_counselor=5, roster_size=8)
+
+def database_is_empty(app_module):
+    with app_module.pooled_connection() as conn:
+        c = conn.cursor()
+        c.execute("SELECT to_regclass('users') IS NOT NULL")
+        if not c.fetchone()[0]:
+            return True
+        c.execute("SELECT NOT EXISTS (SELECT 1 FROM users)")
+        return c.fetchone()[0]
+
+@pytest.fixture(scope='session')
+def app_module():
+    if not os.getenv('DATABASE_URL'):
+        pytest.skip('DATABASE_URL is not set')
+    app_module = benchmark.load_app()
+    if database_is_empty(app_module):
+        os.environ['INITIALIZE_DB'] = 'true'
+        try:
+            app_module.init_db()
+        finally:
+            os.environ['INITIALIZE_DB'] = 'false'
+        app_module.migrate_db()
+        benchmark.seed_dataset(app_module, argparse.Namespace(**TEST_DATASET))
+    else:
+        app_module.migrate_db()
+    yield app_module
+    benchmark.stop_scheduler(app_module)
+
+@pytest.fixture(scope='session')
+def ids(app_module):
+    with app_module.pooled_connection() as conn:
+        return benchmark.discover(conn.cursor())
+
+@pytest.fixture
+def client(app_module):
+    # client(role) is a test client signed in as admin, counselor or
+    # other_counselor, or anonymous for None
+    def client(role=None):
+        return benchmark.role_client(benchmark.TestClient(app_module), role)
+    return client
@@ -0,0 +1,71 @@
+# Writes must invalidate exactly the versioned pages they affect: the pages
+# they change answer 200 to their old ETag, every other page still 304
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+ETAG_PAGES = [
+    ('admin_dashboard', 'admin', '/admin_dashboard'),
+    ('counselor_dashboard', 'counselor', '/counselor_dashboard'),
+    ('counselor_dashboard[other counselor]', 'other_counselor', '/counselor_dashboard'),
+    ('manage_groups', 'admin', '/manage_groups'),
+]
+
+def etag_writes(c, ids):
+    # (label, role, method, path, form, pages expected to change)
+    week_start = datetime.today().date() - timedelta(days=datetime.today().weekday())
+    c.execute("""
+        SELECT id, group_name, class_name, date, group_hours, counselor_id, group_type, notes, location, recurring, frequency
+        FROM classes WHERE counselor_id = %s AND date BETWEEN %s AND %s ORDER BY date, id LIMIT 1
+    """, (ids['counselor_id'], week_start, week_start + timedelta(days=4)))
+    row = c.fetchone()
+    c.execute("SELECT attendee_id FROM class_attendees WHERE class_id = %s", (row[0],))
+    roster = [r[0] for r in c.fetchall()]
+    class_form = {'action': 'edit', 'class_id': row[0], 'group_name': row[1], 'class_name': row[2], 'date': str(row[3]),
+                  'group_hours': row[4], 'counselor_id': row[5], 'group_type': row[6] or '',
+                  'notes': f'etag check {time.time()}', 'location': row[8] or '', 'frequency': row[10] or '',
+                  'attendee_ids': roster}
+    if row[9]:
+        class_form['recurring'] = 'on'
+    attendance_form = {'action': 'submit_attendance'}
+    for attendee_id in ids['roster']:
+        attendance_form[f'present_{attendee_id}'] = 'on'
+    attendee_form = {'action': 'edit', 'attendee_id': ids['attendee_id']}
+    c.execute("SELECT full_name, attendee_id, group_details, notes FROM attendees WHERE id = %s", (ids['attendee_id'],))
+    full_name, attendee_code, group_details, notes = c.fetchone()
+    c.execute("SELECT group_id FROM attendee_groups WHERE attendee_id = %s", (ids['attendee_id'],))
+    attendee_form.update(full_name=full_name, new_attendee_id=attendee_code, group_details=group_details or '',
+                         notes=f'etag check {time.time()}', group_ids=[r[0] for r in c.fetchall()])
+    return [
+        ('class_attendance submit', 'counselor', 'POST', f"/class_attendance/{ids['attendance_class_id']}", attendance_form,
+         set()),
+        ('manage_classes edit', 'admin', 'POST', '/manage_classes', class_form,
+         {'admin_dashboard', 'counselor_dashboard'}),
+        ('manage_attendees edit', 'admin', 'POST', '/manage_attendees', attendee_form, {'manage_groups'}),
+    ]
+
+WRITES = ['class_attendance submit', 'manage_classes edit', 'manage_attendees edit']
+
+@pytest.mark.parametrize('write', WRITES)
+def test_write_invalidates_affected_pages(app_module, ids, client, write):
+    with app_module.pooled_connection() as conn:
+        writes = etag_writes(conn.cursor(), ids)
+    label, role, method, path, form, expected = next(w for w in writes if w[0] == write)
+    clients = {role: client(role) for role in {page[1] for page in ETAG_PAGES} | {role}}
+    etags = {}
+    for page, page_role, page_path in ETAG_PAGES:
+        status, headers, _ = clients[page_role].request('GET', page_path)
+        assert status == 200 and headers.get('ETag'), f"{page} returned {status} without an ETag"
+        etags[page] = headers['ETag']
+        # An unchanged page must revalidate before the write
+        status, _, _ = clients[page_role].request('GET', page_path, headers={'If-None-Match': etags[page]})
+        assert status == 304, f"{page} returned {status} for its own ETag"
+    status, _, _ = clients[role].request(method, path, form)
+    assert status < 400
+    changed = set()
+    for page, page_role, page_path in ETAG_PAGES:
+        status, _, _ = clients[page_role].request('GET', page_path, headers={'If-None-Match': etags[page]})
+        if status == 200:
+            changed.add(page)
+    assert changed == expected
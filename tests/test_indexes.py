@@ -0,0 +1,67 @@
+# The date-range class queries of the dashboards and reports must reach
+# classes through one of the date indexes from the typed-dates migration
+import re
+
+import pytest
+
+import benchmark
+
+DATE_RANGE_PAGES = ['admin_dashboard', 'admin_dashboard[week_offset=-52]', 'counselor_dashboard',
+                    'counselor_dashboard[past_page=20]', 'reports[30 days]', 'reports[1 year, one counselor]']
+DATE_RANGE_RE = re.compile(r'\bdate\s*(?:>=|<=|<|>|=|BETWEEN)', re.IGNORECASE)
+DATE_INDEX_RE = re.compile(r'^idx_classes_(counselor_)?date')
+
+def capture_sql(app_module, monkeypatch):
+    # Every statement a profiled request executes, with its parameters bound
+    captured = []
+    execute = app_module.InstrumentedCursor.execute
+
+    def recording(self, query, vars=None):
+        captured.append(self.mogrify(query, vars).decode())
+        return execute(self, query, vars)
+    monkeypatch.setattr(app_module.InstrumentedCursor, 'execute', recording)
+    return captured
+
+def classes_scans(plan):
+    # (node type, index name) of every plan node reading the classes table
+    scans = []
+    if plan.get('Relation Name') == 'classes':
+        index = plan.get('Index Name')
+        if plan['Node Type'] == 'Bitmap Heap Scan':
+            index = next((child.get('Index Name') for child in plan.get('Plans', []) if child.get('Index Name')), None)
+        scans.append((plan['Node Type'], index))
+    for child in plan.get('Plans', []):
+        scans += classes_scans(child)
+    return scans
+
+@pytest.fixture(scope='module', autouse=True)
+def analyzed(app_module):
+    with app_module.pooled_connection() as conn:
+        conn.cursor().execute("ANALYZE classes")
+        conn.commit()
+
+@pytest.mark.parametrize('page', DATE_RANGE_PAGES)
+def test_date_range_queries_use_date_index(app_module, ids, client, monkeypatch, page):
+    label, role, method, path, form = next(request for request in benchmark.page_requests(ids) if request[0] == page)
+    page_client = client(role)
+    benchmark.reset_caches(app_module)
+    captured = capture_sql(app_module, monkeypatch)
+    status, _, _ = page_client.request(method, path, form)
+    assert status == 200
+    statements = {app_module.normalize_sql(sql): sql for sql in captured
+                  if re.search(r'\bclasses\b', sql) and DATE_RANGE_RE.search(sql)}
+    plans = {}
+    with app_module.pooled_connection() as conn:
+        c = conn.cursor()
+        # On a small dataset a sequential scan rightly wins; what matters is
+        # that a date index can serve the query
+        c.execute("SET LOCAL enable_seqscan = off")
+        for normalized, sql in statements.items():
+            c.execute("EXPLAIN (FORMAT JSON) " + sql)
+            scans = classes_scans(c.fetchone()[0][0]['Plan'])
+            if scans:
+                plans[normalized] = scans
+        conn.rollback()
+    assert plans, f"{label} ran no date-range query on classes"
+    assert {normalized: scans for normalized, scans in plans.items()
+            if not all(index and DATE_INDEX_RE.match(index) for _, index in scans)} == {}
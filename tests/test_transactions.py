@@ -0,0 +1,169 @@
+# Write actions made to fail after they have already written: none of their
+# writes, outbox events or success messages may survive. The same kind of
+# writes succeeding record their side effects, and the rollups match the raw
+# tables once the outbox is drained.
+import time
+from datetime import datetime, timedelta
+
+import pytest
+
+from test_etags import etag_writes
+
+TRANSACTION_TABLES = ('users', 'groups', 'attendees', 'attendee_groups', 'class_series', 'classes', 'class_attendees',
+                      'attendance', 'attendance_class_rollup', 'data_versions')
+FAILED_WRITES = ['manage_groups add', 'manage_attendees add', 'manage_attendees edit', 'manage_attendees delete',
+                 'manage_classes add weekly', 'manage_classes edit', 'manage_classes delete',
+                 'manage_classes bulk_assign_groups', 'counselor_manage_classes edit', 'manage_users delete_counselor']
+
+def table_fingerprints(c):
+    fingerprints = {}
+    for table in TRANSACTION_TABLES:
+        c.execute(f"SELECT COUNT(*), COALESCE(SUM(hashtext(t::text)), 0) FROM {table} t")
+        fingerprints[table] = c.fetchone()
+    return fingerprints
+
+def delete_transaction_fixtures(c):
+    c.execute("SELECT id FROM classes WHERE class_name LIKE 'Transaction Check%'")
+    class_ids = [row[0] for row in c.fetchall()]
+    c.execute("DELETE FROM attendance WHERE class_id = ANY(%s)", (class_ids,))
+    c.execute("DELETE FROM class_attendees WHERE class_id = ANY(%s)", (class_ids,))
+    c.execute("DELETE FROM classes WHERE id = ANY(%s)", (class_ids,))
+    c.execute("DELETE FROM class_series WHERE class_name LIKE 'Transaction Check%'")
+    c.execute("DELETE FROM attendee_groups WHERE attendee_id IN (SELECT id FROM attendees WHERE attendee_id LIKE 'TXN-CHECK%%')")
+    c.execute("DELETE FROM class_attendees WHERE attendee_id IN (SELECT id FROM attendees WHERE attendee_id LIKE 'TXN-CHECK%%')")
+    c.execute("DELETE FROM attendees WHERE attendee_id LIKE 'TXN-CHECK%'")
+    c.execute("DELETE FROM groups WHERE name LIKE 'Transaction Check%'")
+    c.execute("DELETE FROM users WHERE username LIKE 'txn-check%'")
+    c.execute("""
+        INSERT INTO data_versions (scope, version) SELECT unnest(%s::text[]), 1
+        ON CONFLICT (scope) DO UPDATE SET version = data_versions.version + 1
+    """, (['classes', 'groups', 'attendees', 'users'],))
+
+def create_transaction_fixtures(c, ids, day):
+    delete_transaction_fixtures(c)
+    c.execute("INSERT INTO groups (name) VALUES ('Transaction Check') RETURNING id")
+    group_id = c.fetchone()[0]
+    c.execute("INSERT INTO attendees (full_name, attendee_id, group_details, notes) VALUES ('Transaction Check', 'TXN-CHECK', '', '') RETURNING id")
+    attendee_id = c.fetchone()[0]
+    c.execute("INSERT INTO attendee_groups (attendee_id, group_id) VALUES (%s, %s)", (attendee_id, group_id))
+    c.execute("""
+        INSERT INTO users (username, password, full_name, role, credentials, email)
+        VALUES ('txn-check', 'unused', 'Transaction Check', 'counselor', '', '') RETURNING id
+    """)
+    counselor_id = c.fetchone()[0]
+    c.execute("""
+        INSERT INTO classes (group_name, class_name, date, group_hours, counselor_id, group_type, notes, location, recurring)
+        SELECT 'Group 1', 'Transaction Check', %s, '09:00-10:30', unnest(%s::int[]), 'Therapy', '', 'Office', 0
+        RETURNING id
+    """, (day, [ids['counselor_id'], counselor_id]))
+    class_id, counselor_class_id = [row[0] for row in c.fetchall()]
+    c.execute("INSERT INTO class_attendees (class_id, attendee_id) VALUES (%s, %s), (%s, %s)",
+              (class_id, attendee_id, counselor_class_id, attendee_id))
+    return {'group_id': group_id, 'attendee_id': attendee_id, 'counselor_id': counselor_id, 'class_id': class_id}
+
+def transaction_cases(ids, fixtures, day):
+    # (label, role, path, form, function that fails after running, message the action flashes on success)
+    class_form = {'group_name': 'Group 1', 'class_name': 'Transaction Check', 'date': day, 'group_hours': '09:00-10:30',
+                  'counselor_id': ids['counselor_id'], 'group_type': 'Therapy', 'notes': 'changed', 'location': 'Office'}
+    attendee_form = {'full_name': 'Transaction Check', 'group_details': '', 'notes': 'changed',
+                     'group_ids': [fixtures['group_id'], ids['group_id']]}
+    return [
+        ('manage_groups add', 'admin', '/manage_groups', {'action': 'add', 'name': 'Transaction Check Added'},
+         'bump_data_versions', 'Group added successfully'),
+        ('manage_attendees add', 'admin', '/manage_attendees', dict(attendee_form, action='add', attendee_id='TXN-CHECK-ADDED'),
+         'bump_data_versions', 'Attendee added successfully'),
+        ('manage_attendees edit', 'admin', '/manage_attendees',
+         dict(attendee_form, action='edit', attendee_id=fixtures['attendee_id'], new_attendee_id='TXN-CHECK-EDITED'),
+         'bump_data_versions', 'Attendee updated successfully'),
+        ('manage_attendees delete', 'admin', '/manage_attendees', {'action': 'delete', 'attendee_id': ids['attendee_id']},
+         'UnitOfWork.record', 'Attendee deleted successfully'),
+        ('manage_classes add weekly', 'admin', '/manage_classes',
+         dict(class_form, action='add', class_name='Transaction Check Series', recurring='on', frequency='weekly'),
+         'materialize_recurring_classes', 'Class added successfully'),
+        ('manage_classes edit', 'admin', '/manage_classes',
+         dict(class_form, action='edit', class_id=fixtures['class_id'], attendee_ids=ids['roster'][:5]),
+         'replace_class_rosters', 'Class updated successfully'),
+        ('manage_classes delete', 'admin', '/manage_classes', {'action': 'delete', 'class_id': ids['attendance_class_id']},
+         'bump_data_versions', 'Class deleted successfully'),
+        ('manage_classes bulk_assign_groups', 'admin', '/manage_classes',
+         {'action': 'bulk_assign_groups', 'group_ids': [ids['group_id']], 'start_date': day, 'end_date': day,
+          'class_name': 'Transaction Check'},
+         'assign_groups_to_classes', 'attendees to '),
+        ('counselor_manage_classes edit', 'counselor', '/counselor_manage_classes',
+         dict(class_form, action='edit', class_id=fixtures['class_id'], attendee_ids=ids['roster'][:5]),
+         'replace_class_rosters', 'Class updated successfully'),
+        ('manage_users delete_counselor', 'admin', '/manage_users', {'action': 'delete_counselor', 'counselor_id': fixtures['counselor_id']},
+         'bump_data_versions', 'Counselor and associated classes deleted successfully'),
+    ]
+
+def pending_outbox(c):
+    c.execute("SELECT COUNT(*) FROM outbox WHERE kind = 'refresh_rollups' AND processed_at IS NULL")
+    return c.fetchone()[0]
+
+@pytest.fixture(scope='module')
+def cases(app_module, ids):
+    day = str(datetime.today().date() + timedelta(days=7))
+    with app_module.pooled_connection() as conn:
+        c = conn.cursor()
+        fixtures = create_transaction_fixtures(c, ids, day)
+        conn.commit()
+    yield {case[0]: case for case in transaction_cases(ids, fixtures, day)}
+    with app_module.pooled_connection() as conn:
+        delete_transaction_fixtures(conn.cursor())
+        conn.commit()
+
+@pytest.mark.parametrize('write', FAILED_WRITES)
+def test_failed_write_leaves_nothing_behind(app_module, client, monkeypatch, cases, write):
+    label, role, path, form, failing, message = cases[write]
+    writer = client(role)
+    with app_module.pooled_connection() as conn:
+        c = conn.cursor()
+        before = table_fingerprints(c)
+        c.execute("SELECT COALESCE(MAX(id), 0) FROM outbox")
+        last_event = c.fetchone()[0]
+        conn.commit()
+    # app_module.<name> (or <Class>.<method>) raises once the original has run
+    owner, _, attribute = failing.rpartition('.')
+    owner = getattr(app_module, owner) if owner else app_module
+    original = getattr(owner, attribute)
+
+    def failing_after(*args, **kwargs):
+        original(*args, **kwargs)
+        raise app_module.psycopg2.OperationalError(f'injected failure after {failing}')
+    monkeypatch.setattr(owner, attribute, failing_after)
+    status, _, body = writer.request('POST', path, form)
+    monkeypatch.undo()
+    with app_module.pooled_connection() as conn:
+        c = conn.cursor()
+        changed = [table for table, fingerprint in table_fingerprints(c).items() if fingerprint != before[table]]
+        c.execute("SELECT COUNT(*) FROM outbox WHERE id > %s", (last_event,))
+        events = c.fetchone()[0]
+    assert status == 200
+    assert changed == []
+    assert events == 0
+    assert message.encode() not in body
+
+def test_successful_writes_drain_outbox(app_module, ids, client):
+    with app_module.pooled_connection() as conn:
+        c = conn.cursor()
+        writes = etag_writes(c, ids)[1:]
+        c.execute("SELECT COALESCE(MAX(id), 0) FROM outbox")
+        last_event = c.fetchone()[0]
+    writers = {role: client(role) for role in {w[1] for w in writes}}
+    for label, role, method, path, form, _ in writes:
+        status, _, _ = writers[role].request(method, path, form)
+        assert status < 400, f"{label} failed with status {status}"
+    deadline = time.monotonic() + 30
+    with app_module.pooled_connection() as conn:
+        c = conn.cursor()
+        while pending_outbox(c) and time.monotonic() < deadline:
+            conn.commit()
+            if app_module.dispatch_outbox() is None:
+                time.sleep(0.1)
+        c.execute("SELECT kind, COUNT(*) FROM outbox WHERE id > %s GROUP BY kind ORDER BY kind", (last_event,))
+        events = dict(c.fetchall())
+        pending = pending_outbox(c)
+        mismatches = app_module.check_attendance_rollups(c)
+    assert {'refresh_rollups', 'invalidate'} <= set(events)
+    assert pending == 0
+    assert {table: count for table, count in mismatches.items() if count} == {}
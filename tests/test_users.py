@@ -0,0 +1,55 @@
+# Editing and deleting a counselor through manage_users must reach load_user
+# and the counselor's own session, with identities looked up per request and
+# kept in the session
+import pytest
+
+import benchmark
+
+USERNAME = 'check-users'
+
+def delete_check_users(app_module):
+    with app_module.pooled_connection() as conn:
+        conn.cursor().execute("DELETE FROM users WHERE username LIKE 'check-users%'")
+        conn.commit()
+
+@pytest.fixture
+def user_id(app_module):
+    delete_check_users(app_module)
+    with app_module.pooled_connection() as conn:
+        c = conn.cursor()
+        c.execute("""
+            INSERT INTO users (username, password, full_name, role, credentials, email)
+            VALUES (%s, %s, 'User Check', 'counselor', '', '') RETURNING id
+        """, (USERNAME, app_module.bcrypt.generate_password_hash(benchmark.COUNSELOR_PASSWORD).decode('utf-8')))
+        user_id = c.fetchone()[0]
+        conn.commit()
+    yield user_id
+    delete_check_users(app_module)
+
+@pytest.mark.parametrize('session_identity', [False, True], ids=['lookup', 'session'])
+def test_user_changes_reach_load_user_and_session(app_module, client, monkeypatch, user_id, session_identity):
+    flask_app = app_module.app
+    monkeypatch.setitem(flask_app.config, 'SESSION_USER_IDENTITY', session_identity)
+    admin = client('admin')
+    counselor = benchmark.login(benchmark.TestClient(app_module), USERNAME, benchmark.COUNSELOR_PASSWORD)
+
+    def loaded():
+        with flask_app.test_request_context():
+            user = app_module.load_user(str(user_id))
+            return (user.username, user.role) if user else None
+
+    def signed_in():
+        status, _, _ = counselor.request('GET', '/counselor_dashboard')
+        return status == 200
+
+    assert loaded() == (USERNAME, 'counselor')
+    assert signed_in()
+
+    user_form = {'counselor_id': user_id, 'full_name': 'User Check', 'credentials': '', 'email': ''}
+    admin.request('POST', '/manage_users', dict(user_form, action='edit_counselor', username=f'{USERNAME}-renamed'))
+    assert loaded() == (f'{USERNAME}-renamed', 'counselor')
+    assert signed_in()
+
+    admin.request('POST', '/manage_users', {'action': 'delete_counselor', 'counselor_id': user_id})
+    assert loaded() is None
+    assert not signed_in()